@@ -13,6 +13,14 @@ class Settings(BaseSettings):
     
     SERVICE_ACCOUNT_EMAIL: str = "mock-sa@example.com"
 
+    # Admission control for /upload (redaction is CPU-bound)
+    MAX_CONCURRENT_REDACTIONS: int = 2
+    MAX_QUEUED_BYTES: int = 50 * 1024 * 1024
+    MAX_QUEUED_PER_USER: int = 3
+    ADMISSION_QUEUE_TIMEOUT: float = 30.0
+    # Seed for the redaction time estimate behind Retry-After and early shedding
+    ADMISSION_INITIAL_SERVICE_TIME: float = 5.0
+
     class Config:
         env_file = ".env"
 
@@ -1,7 +1,8 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import uuid
 import logging
@@ -14,7 +15,9 @@ from app.config import get_settings
 from app.services.storage import storage_service
 from app.services.processor import processor_service
 from app.services.ai import ai_service
+from app.services.admission import admission_controller, AdmissionRejected
 from app.logging_config import setup_logging, log_audit
+from app.middleware import AdmissionMiddleware
 
 # Setup Structured Logging
 setup_logging()
@@ -26,6 +29,9 @@ Base.metadata.create_all(bind=engine)
 settings = get_settings()
 app = FastAPI(title="Google Cloud File Vault")
 
+# Admission control for /upload (added before CORS so shed responses still carry CORS headers)
+app.add_middleware(AdmissionMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -60,36 +66,49 @@ def clean_currency(value):
 
 @app.post("/upload")
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
     x_user_id: str = Header(..., alias="X-User-ID")
 ):
     correlation_id = str(uuid.uuid4())
     log_audit("UPLOAD_INITIATED", x_user_id, {"correlation_id": correlation_id, "filename": file.filename})
 
+    raw_blob_name = f"{x_user_id}/{correlation_id}_raw.pdf"
+    raw_uploaded = False
+
+    # Reserved by AdmissionMiddleware before the body was received
+    ticket = request.state.admission_ticket
+
     try:
         content = await file.read()
-        
+
         # 1. Save Raw to Quarantine (Step 1)
-        raw_blob_name = f"{x_user_id}/{correlation_id}_raw.pdf"
-        storage_service.upload_stream(
+        # Storage calls are blocking network I/O; keep them off the event loop
+        await run_in_threadpool(
+            storage_service.upload_stream,
             settings.QUARANTINE_BUCKET, 
             io.BytesIO(content), 
             raw_blob_name
         )
+        raw_uploaded = True
 
         # 2. Redact (Step 2)
-        redacted_content = processor_service.redact_pdf(content)
+        # Only the rasterization is timed for the Retry-After estimate
+        async with admission_controller.slot(ticket):
+            redacted_content = await run_in_threadpool(processor_service.redact_pdf, content)
         
         # 3. Save Redacted to Quarantine
         redacted_blob_name = f"{x_user_id}/{correlation_id}_redacted.pdf"
-        storage_service.upload_stream(
+        await run_in_threadpool(
+            storage_service.upload_stream,
             settings.QUARANTINE_BUCKET,
             io.BytesIO(redacted_content),
             redacted_blob_name
         )
         
         # Generate Preview URL (Step 3)
-        preview_url = storage_service.generate_signed_url(
+        preview_url = await run_in_threadpool(
+            storage_service.generate_signed_url,
             settings.QUARANTINE_BUCKET,
             redacted_blob_name
         )
@@ -100,6 +119,29 @@ async def upload_file(
             "preview_url": preview_url
         }
 
+    except AdmissionRejected as e:
+        log_audit("UPLOAD_REJECTED", x_user_id, {
+            "correlation_id": correlation_id,
+            "status_code": e.status_code,
+            "reason": e.reason,
+            "queue_depth": admission_controller.queue_depth
+        })
+        if raw_uploaded:
+            # Timed out in the queue; never leave an unredacted file behind
+            try:
+                await run_in_threadpool(
+                    storage_service.delete_blob,
+                    settings.QUARANTINE_BUCKET,
+                    raw_blob_name
+                )
+            except Exception as delete_error:
+                # Quarantine lifecycle policy removes it within the hour
+                logger.error(f"Failed to delete raw blob after rejection: {delete_error}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -186,6 +228,15 @@ async def get_records(
     records = db.query(TaxRecord).filter(TaxRecord.user_id == x_user_id).all()
     return records
 
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """
+    Admission control gauges for this instance only (queue depth, in-flight
+    redactions, shed counts). Fleet-wide tracking uses the structured
+    "Admission: ..." log entries.
+    """
+    return admission_controller.stats()
+
 # Serve Frontend Static Files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
@@ -0,0 +1,59 @@
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.admission import admission_controller, AdmissionRejected
+from app.logging_config import log_audit
+
+class AdmissionMiddleware:
+    """
+    Reserves an admission ticket for POST /upload from the headers alone,
+    before the multipart body is parsed, so shed requests never have their
+    body buffered or their raw PDF written to quarantine. The ticket is
+    exposed to the handler as request.state.admission_ticket and released
+    when the response finishes, whatever the outcome.
+    """
+    def __init__(self, app: ASGIApp, path: str = "/upload"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        user_id = headers.get("x-user-id")
+        if user_id is None:
+            # Let the route's own header validation produce the 422
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get("content-length", "")
+        if not content_length.isdigit():
+            # Without a length the byte cap cannot be applied up front
+            response = JSONResponse({"detail": "Content-Length required"}, status_code=411)
+            await response(scope, receive, send)
+            return
+
+        try:
+            ticket = admission_controller.reserve(user_id, int(content_length))
+        except AdmissionRejected as e:
+            log_audit("UPLOAD_REJECTED", user_id, {
+                "status_code": e.status_code,
+                "reason": e.reason,
+                "queue_depth": admission_controller.queue_depth
+            })
+            response = JSONResponse(
+                {"detail": e.reason},
+                status_code=e.status_code,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["admission_ticket"] = ticket
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_controller.release(ticket)
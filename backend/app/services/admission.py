@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from app.config import get_settings
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a redaction cannot be admitted. Carries the HTTP status
+    (429 for a single user over their share, 503 for a saturated instance)
+    and a Retry-After hint in seconds.
+    """
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionTicket:
+    """
+    A reserved place for one upload: either a held redaction slot or a
+    position in its user's queue. Released exactly once via release().
+    """
+    __slots__ = ("user_id", "size", "future", "deadline", "released")
+
+    def __init__(self, user_id: str, size: int, future: asyncio.Future, deadline: float):
+        self.user_id = user_id
+        self.size = size
+        self.future = future
+        self.deadline = deadline
+        self.released = False
+
+    @property
+    def granted(self) -> bool:
+        return self.future.done()
+
+class AdmissionController:
+    """
+    Bounds concurrent redactions on this instance. Each upload reserves a
+    ticket before its body is read (see app/middleware.py). Requests beyond
+    the concurrency cap wait in per-user FIFO queues that are drained
+    round-robin, so one user uploading a burst cannot starve the others.
+    Requests are shed immediately when the queued bytes cap or the
+    per-user queue cap is hit, or when the estimated wait already exceeds
+    the timeout; anything still queued at the timeout is shed then.
+
+    All state is touched only from the event loop, so no locking is needed.
+    """
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queued_bytes: int,
+        max_queued_per_user: int,
+        queue_timeout: float,
+        initial_service_time: float = 5.0,
+    ):
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queued_bytes = max_queued_bytes
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued_bytes = 0
+        self._queues: dict[str, deque] = {}
+        # Round-robin order of users that currently have waiters
+        self._ready: deque = deque()
+        # Moving average of redaction time; the seed drives early shedding
+        self._avg_service_time = initial_service_time
+        self._admitted_total = 0
+        self._rejected_total = {429: 0, 503: 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def retry_after(self) -> int:
+        """
+        Estimate seconds until a slot frees up for a new request.
+        """
+        backlog = self.queue_depth + 1
+        estimate = self._avg_service_time * backlog / self.max_concurrent
+        return max(1, math.ceil(estimate))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth,
+            "queued_bytes": self._queued_bytes,
+            "max_queued_bytes": self.max_queued_bytes,
+            "users_waiting": len(self._ready),
+            "avg_service_seconds": round(self._avg_service_time, 3),
+            "admitted_total": self._admitted_total,
+            "rejected_429_total": self._rejected_total[429],
+            "rejected_503_total": self._rejected_total[503],
+        }
+
+    def _log_state(self, event: str, user_id: str):
+        # Structured for Cloud Logging, so a log-based metric can track queue
+        # depth across instances.
+        logger.info(f"Admission: {event}", extra={"json_fields": {
+            "admission_event": event,
+            "user_id": user_id,
+            "queue_depth": self.queue_depth,
+            "active": self._active,
+            "queued_bytes": self._queued_bytes,
+        }})
+
+    def _reject(self, user_id: str, status_code: int, reason: str) -> AdmissionRejected:
+        self._rejected_total[status_code] += 1
+        self._log_state("shed", user_id)
+        return AdmissionRejected(status_code, reason, self.retry_after())
+
+    def _has_free_slot(self) -> bool:
+        return self._active < self.max_concurrent and not self._ready
+
+    def reserve(self, user_id: str, size: int) -> AdmissionTicket:
+        """
+        Take a slot or a queue position for an upload of `size` bytes, or
+        raise AdmissionRejected. Call before doing any work for the request;
+        the ticket must be passed to release() on every exit path.
+        """
+        ticket = AdmissionTicket(
+            user_id,
+            size,
+            asyncio.get_running_loop().create_future(),
+            time.monotonic() + self.queue_timeout,
+        )
+        if self._has_free_slot():
+            self._grant(ticket)
+            return ticket
+
+        user_queue = self._queues.get(user_id)
+        if user_queue is not None and len(user_queue) >= self.max_queued_per_user:
+            raise self._reject(user_id, 429, "Too many pending uploads for this user")
+        if self._queued_bytes + size > self.max_queued_bytes:
+            raise self._reject(user_id, 503, "Redaction queue is full")
+        if self.retry_after() > self.queue_timeout:
+            raise self._reject(user_id, 503, "Estimated wait exceeds queue timeout")
+
+        if user_queue is None:
+            user_queue = self._queues[user_id] = deque()
+            self._ready.append(user_id)
+        user_queue.append(ticket)
+        self._queued_bytes += size
+        self._log_state("queue", user_id)
+        return ticket
+
+    async def wait(self, ticket: AdmissionTicket):
+        """
+        Wait until the ticket holds a slot. Raises AdmissionRejected (503) if
+        the queue timeout, counted from reserve(), passes first.
+        """
+        if ticket.granted:
+            return
+        remaining = ticket.deadline - time.monotonic()
+        try:
+            if remaining > 0:
+                # asyncio.wait, unlike wait_for, never swallows a cancellation
+                # that lands just after the slot is granted.
+                await asyncio.wait({ticket.future}, timeout=remaining)
+        except asyncio.CancelledError:
+            # Client went away while queued (or just after being granted).
+            self.release(ticket)
+            raise
+
+        if not ticket.granted:
+            self.release(ticket)
+            raise self._reject(ticket.user_id, 503, "Timed out waiting for a redaction slot")
+
+    def release(self, ticket: AdmissionTicket, service_time: Optional[float] = None):
+        """
+        Give back the ticket's slot or queue position. Safe to call twice.
+        """
+        if ticket.released:
+            return
+        ticket.released = True
+        if not ticket.granted:
+            self._remove(ticket)
+        else:
+            self._active -= 1
+            if service_time is not None:
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+            self._dispatch()
+        self._log_state("release", ticket.user_id)
+
+    def _remove(self, ticket: AdmissionTicket):
+        user_queue = self._queues[ticket.user_id]
+        user_queue.remove(ticket)
+        self._queued_bytes -= ticket.size
+        if not user_queue:
+            del self._queues[ticket.user_id]
+            self._ready.remove(ticket.user_id)
+
+    def _grant(self, ticket: AdmissionTicket):
+        self._active += 1
+        self._admitted_total += 1
+        ticket.future.set_result(None)
+        self._log_state("admit", ticket.user_id)
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._ready:
+            user_id = self._ready.popleft()
+            user_queue = self._queues[user_id]
+            ticket = user_queue.popleft()
+            self._queued_bytes -= ticket.size
+            if user_queue:
+                self._ready.append(user_id)
+            else:
+                del self._queues[user_id]
+            self._grant(ticket)
+
+    @asynccontextmanager
+    async def slot(self, ticket: AdmissionTicket):
+        """
+        Wait for the ticket's slot and release it when the block exits. Only
+        the block is timed for the service-time estimate.
+        """
+        await self.wait(ticket)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(ticket, time.monotonic() - start)
+
+admission_controller = AdmissionController(
+    max_concurrent=settings.MAX_CONCURRENT_REDACTIONS,
+    max_queued_bytes=settings.MAX_QUEUED_BYTES,
+    max_queued_per_user=settings.MAX_QUEUED_PER_USER,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    initial_service_time=settings.ADMISSION_INITIAL_SERVICE_TIME,
+)
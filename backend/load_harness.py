@@ -0,0 +1,181 @@
+"""
+Overload harness for /upload admission control (mock mode).
+
+Starts the API in-process with USE_MOCK_GCP=True, then fires a burst of
+uploads of a real 1040 PDF from several users, far faster than the
+instance can redact them.
+
+By default the 300 DPI rasterization is replaced with a simulated
+CPU-bound job that slows down as more jobs share LOAD_CPU_CORES cores
+(default: os.cpu_count()), so the numbers reflect that model rather than
+real rendering. Set LOAD_REAL_REDACTION=1 to run the real redact_pdf
+(with mock DLP) instead; this needs poppler's pdftoppm on PATH.
+
+    python load_harness.py
+    LOAD_REAL_REDACTION=1 python load_harness.py
+
+Exits non-zero if admitted p99 latency or p99 time-to-reject exceeds its
+limit, if any 429/503 lacks Retry-After, or on any other status code.
+Lifting the limits shows the failure mode admission control prevents
+(every request slows down together) and fails the latency check:
+
+    MAX_CONCURRENT_REDACTIONS=1000 MAX_QUEUED_PER_USER=1000 \\
+        MAX_QUEUED_BYTES=1000000000 python load_harness.py
+"""
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+PDF_PATH = os.path.join(os.path.dirname(__file__), "..", "test_files", "sample_1040.pdf")
+with open(PDF_PATH, "rb") as f:
+    PAYLOAD = f.read()
+
+os.environ.setdefault("USE_MOCK_GCP", "True")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./load_test.db")
+# Room for only a handful of queued uploads, so the byte cap is exercised
+os.environ.setdefault("MAX_QUEUED_BYTES", str(6 * len(PAYLOAD)))
+os.environ.setdefault("ADMISSION_QUEUE_TIMEOUT", "10")
+
+import requests
+import uvicorn
+
+from app.main import app
+from app.services.processor import processor_service
+from app.services.admission import admission_controller
+
+PORT = int(os.environ.get("LOAD_TEST_PORT", "8099"))
+ADMITTED_P99_LIMIT = float(os.environ.get("ADMITTED_P99_LIMIT", "5.0"))
+REJECT_P99_LIMIT = float(os.environ.get("REJECT_P99_LIMIT", "1.0"))
+REAL_REDACTION = os.environ.get("LOAD_REAL_REDACTION", "") not in ("", "0", "false", "False")
+CPU_CORES = int(os.environ.get("LOAD_CPU_CORES", os.cpu_count() or 1))
+WORK_SECONDS = 0.5
+USERS = ["alice", "bob", "carol", "dave"]
+REQUESTS_PER_USER = 15
+ARRIVAL_INTERVAL = 0.03
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+def simulated_redact_pdf(pdf_bytes: bytes) -> bytes:
+    """
+    Stand-in for rasterization: each job needs WORK_SECONDS of one core,
+    and jobs beyond CPU_CORES time-slice, so latency grows with load.
+    """
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+    try:
+        done = 0.0
+        tick = 0.02
+        while done < WORK_SECONDS:
+            time.sleep(tick)
+            with _inflight_lock:
+                share = min(1.0, CPU_CORES / _inflight)
+            done += tick * share
+        return pdf_bytes
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def upload(index: int, user_id: str):
+    time.sleep(index * ARRIVAL_INTERVAL)
+    start = time.monotonic()
+    resp = requests.post(
+        f"http://127.0.0.1:{PORT}/upload",
+        headers={"X-User-ID": user_id},
+        files={"file": ("sample_1040.pdf", PAYLOAD, "application/pdf")},
+        timeout=120,
+    )
+    detail = resp.json().get("detail") if resp.status_code != 200 else None
+    return resp.status_code, resp.headers.get("Retry-After"), detail, time.monotonic() - start
+
+def main():
+    if REAL_REDACTION:
+        if shutil.which("pdftoppm") is None:
+            print("LOAD_REAL_REDACTION needs poppler (pdftoppm) on PATH")
+            sys.exit(2)
+        mode = "real redact_pdf with mock DLP"
+    else:
+        processor_service.redact_pdf = simulated_redact_pdf
+        mode = f"simulated redaction ({WORK_SECONDS}s of CPU across {CPU_CORES} cores)"
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"Admission: max_concurrent={admission_controller.max_concurrent}, "
+          f"max_queued_per_user={admission_controller.max_queued_per_user}, "
+          f"max_queued_bytes={admission_controller.max_queued_bytes}, "
+          f"queue_timeout={admission_controller.queue_timeout}s")
+    print(f"Redaction: {mode}")
+    jobs = [user for _ in range(REQUESTS_PER_USER) for user in USERS]
+    print(f"Firing {len(jobs)} uploads of {len(PAYLOAD)} bytes from {len(USERS)} users "
+          f"every {ARRIVAL_INTERVAL}s...")
+
+    depth_samples = []
+    stop = threading.Event()
+
+    def sample_stats():
+        while not stop.is_set():
+            depth_samples.append(requests.get(f"http://127.0.0.1:{PORT}/admission/stats").json()["queue_depth"])
+            time.sleep(0.1)
+
+    sampler = threading.Thread(target=sample_stats, daemon=True)
+    sampler.start()
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(upload, range(len(jobs)), jobs))
+
+    stop.set()
+    sampler.join()
+
+    ok = [latency for status, _, _, latency in results if status == 200]
+    shed = [result for result in results if result[0] in (429, 503)]
+    shed_latencies = [latency for _, _, _, latency in shed]
+    missing_retry_after = sum(1 for _, retry, _, _ in shed if retry is None)
+    errors = [status for status, _, _, _ in results if status not in (200, 429, 503)]
+
+    admitted_p99 = percentile(ok, 99)
+    reject_p99 = percentile(shed_latencies, 99)
+    print(f"Admitted: {len(ok)}  p50={percentile(ok, 50):.2f}s  p95={percentile(ok, 95):.2f}s  "
+          f"p99={admitted_p99:.2f}s  max={max(ok, default=0.0):.2f}s")
+    print(f"Shed: {len(shed)}  p99 time-to-reject={reject_p99:.2f}s  "
+          f"missing Retry-After={missing_retry_after}")
+    for (status, detail), count in sorted(Counter((s, d) for s, _, d, _ in shed).items()):
+        print(f"  {status} {detail}: {count}")
+    print(f"Peak queue depth: {max(depth_samples, default=0)}")
+    print(f"Final stats: {requests.get(f'http://127.0.0.1:{PORT}/admission/stats').json()}")
+
+    server.should_exit = True
+    thread.join()
+
+    failures = []
+    if admitted_p99 > ADMITTED_P99_LIMIT:
+        failures.append(f"admitted p99 {admitted_p99:.2f}s > {ADMITTED_P99_LIMIT}s")
+    if reject_p99 > REJECT_P99_LIMIT:
+        failures.append(f"time-to-reject p99 {reject_p99:.2f}s > {REJECT_P99_LIMIT}s")
+    if missing_retry_after:
+        failures.append(f"{missing_retry_after} rejections without Retry-After")
+    if errors:
+        failures.append(f"unexpected status codes: {errors}")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+def make_controller(**overrides):
+    limits = dict(
+        max_concurrent=1,
+        max_queued_bytes=1000,
+        max_queued_per_user=2,
+        queue_timeout=5.0,
+        # Keep the estimated wait well under the timeout unless a test says otherwise
+        initial_service_time=0.01,
+    )
+    limits.update(overrides)
+    return AdmissionController(**limits)
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_grants_immediately_under_cap():
+    async def scenario():
+        controller = make_controller(max_concurrent=2)
+        first = controller.reserve("alice", 10)
+        second = controller.reserve("bob", 10)
+        assert first.granted and second.granted
+        assert controller.stats()["active"] == 2
+        assert controller.queue_depth == 0
+
+    asyncio.run(scenario())
+
+def test_round_robin_across_users():
+    async def scenario():
+        controller = make_controller(max_queued_per_user=3)
+        holder = controller.reserve("holder", 10)
+
+        order = []
+
+        async def request(ticket, tag):
+            async with controller.slot(ticket):
+                order.append(tag)
+
+        tickets = [
+            ("a1", controller.reserve("alice", 10)),
+            ("a2", controller.reserve("alice", 10)),
+            ("a3", controller.reserve("alice", 10)),
+            ("b1", controller.reserve("bob", 10)),
+            ("b2", controller.reserve("bob", 10)),
+        ]
+        assert controller.queue_depth == 5
+        tasks = [asyncio.create_task(request(ticket, tag)) for tag, ticket in tickets]
+        await settle()
+
+        controller.release(holder)
+        await asyncio.gather(*tasks)
+        assert order == ["a1", "b1", "a2", "b2", "a3"]
+        assert controller.stats()["queued_bytes"] == 0
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+def test_per_user_cap_returns_429():
+    async def scenario():
+        controller = make_controller()
+        controller.reserve("holder", 10)
+        controller.reserve("alice", 10)
+        controller.reserve("alice", 10)
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            controller.reserve("alice", 10)
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.retry_after >= 1
+
+        # Other users still get queued
+        controller.reserve("bob", 10)
+        assert controller.queue_depth == 3
+
+    asyncio.run(scenario())
+
+def test_byte_cap_returns_503():
+    async def scenario():
+        controller = make_controller(max_queued_bytes=100)
+        # A granted ticket is not counted against the queue byte cap
+        controller.reserve("holder", 500)
+        controller.reserve("alice", 60)
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            controller.reserve("bob", 50)
+        assert excinfo.value.status_code == 503
+        assert controller.stats()["rejected_503_total"] == 1
+
+    asyncio.run(scenario())
+
+def test_estimated_wait_over_timeout_returns_503():
+    async def scenario():
+        controller = make_controller(queue_timeout=3.0, initial_service_time=2.0)
+        controller.reserve("holder", 10)
+        controller.reserve("alice", 10)
+
+        # Second in line would wait ~4s, past the 3s timeout
+        with pytest.raises(AdmissionRejected) as excinfo:
+            controller.reserve("bob", 10)
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.retry_after > controller.queue_timeout
+
+    asyncio.run(scenario())
+
+def test_rejects_non_positive_concurrency():
+    with pytest.raises(ValueError):
+        make_controller(max_concurrent=0)
+
+def test_free_slot_ignores_queue_caps():
+    async def scenario():
+        controller = make_controller(max_queued_bytes=1)
+        assert controller.reserve("alice", 10_000).granted
+
+    asyncio.run(scenario())
+
+def test_queue_timeout_returns_503_and_frees_queue():
+    async def scenario():
+        controller = make_controller(queue_timeout=1.0)
+        controller.reserve("holder", 10)
+        ticket = controller.reserve("alice", 10)
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.wait(ticket)
+        assert excinfo.value.status_code == 503
+        stats = controller.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["queued_bytes"] == 0
+        assert stats["users_waiting"] == 0
+        assert stats["active"] == 1
+
+        # The middleware's release on the way out is a no-op
+        controller.release(ticket)
+        assert controller.stats()["active"] == 1
+
+    asyncio.run(scenario())
+
+def test_release_while_queued_removes_ticket():
+    async def scenario():
+        controller = make_controller()
+        holder = controller.reserve("holder", 10)
+        ticket = controller.reserve("alice", 10)
+        assert controller.queue_depth == 1
+
+        controller.release(ticket)
+        stats = controller.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["queued_bytes"] == 0
+        assert stats["active"] == 1
+
+        controller.release(holder)
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+def test_cancel_while_queued_removes_ticket():
+    async def scenario():
+        controller = make_controller()
+        controller.reserve("holder", 10)
+        ticket = controller.reserve("alice", 10)
+        waiter = asyncio.create_task(controller.wait(ticket))
+        await settle()
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.queue_depth == 0
+        assert controller.stats()["active"] == 1
+
+    asyncio.run(scenario())
+
+def test_cancel_after_grant_releases_slot():
+    async def scenario():
+        controller = make_controller()
+        holder = controller.reserve("holder", 10)
+        ticket = controller.reserve("alice", 10)
+
+        async def request():
+            async with controller.slot(ticket):
+                await asyncio.sleep(10)
+
+        waiter = asyncio.create_task(request())
+        await settle()
+
+        # Grant the slot, then cancel before the waiter task resumes
+        controller.release(holder)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        assert waiter.cancelled()
+        stats = controller.stats()
+        assert stats["active"] == 0
+        assert stats["queue_depth"] == 0
+
+    asyncio.run(scenario())
+
+def test_slot_releases_on_error():
+    async def scenario():
+        controller = make_controller()
+        ticket = controller.reserve("alice", 10)
+        with pytest.raises(RuntimeError):
+            async with controller.slot(ticket):
+                raise RuntimeError("redaction failed")
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+def test_burst_is_shed_before_raw_upload():
+    """
+    Simulates the /upload flow for a burst of simultaneous requests:
+    reserve (middleware) -> raw upload -> slot (redaction) -> release.
+    Every rejection must happen at reserve time, before the raw upload.
+    """
+    async def scenario():
+        controller = make_controller(
+            max_concurrent=2,
+            max_queued_bytes=5000,
+            max_queued_per_user=3,
+            queue_timeout=30.0,
+        )
+        outcomes = []
+
+        async def handler(index):
+            user_id = f"user-{index % 4}"
+            try:
+                ticket = controller.reserve(user_id, 1000)
+            except AdmissionRejected:
+                outcomes.append("shed_before_upload")
+                return
+            try:
+                await asyncio.sleep(0.02)  # raw quarantine upload
+                try:
+                    async with controller.slot(ticket):
+                        await asyncio.sleep(0.01)  # redaction
+                except AdmissionRejected:
+                    outcomes.append("shed_after_upload")
+                    return
+                outcomes.append("completed")
+            finally:
+                controller.release(ticket)
+
+        await asyncio.gather(*(handler(i) for i in range(40)))
+
+        # 2 slots + 5 queued (byte cap) are admitted; the rest never upload
+        assert outcomes.count("completed") == 7
+        assert outcomes.count("shed_before_upload") == 33
+        assert "shed_after_upload" not in outcomes
+        stats = controller.stats()
+        assert stats["active"] == 0
+        assert stats["queue_depth"] == 0
+        assert stats["queued_bytes"] == 0
+
+    asyncio.run(scenario())
+
+def test_logs_queue_depth_on_admit_queue_release_and_shed(caplog):
+    async def scenario():
+        controller = make_controller(max_queued_per_user=1)
+        holder = controller.reserve("holder", 10)
+        controller.reserve("alice", 10)
+        with pytest.raises(AdmissionRejected):
+            controller.reserve("alice", 10)
+        controller.release(holder)
+
+    with caplog.at_level("INFO", logger="app.services.admission"):
+        asyncio.run(scenario())
+
+    entries = [(r.json_fields["admission_event"], r.json_fields["queue_depth"])
+               for r in caplog.records if hasattr(r, "json_fields")]
+    assert entries == [
+        ("admit", 0),
+        ("queue", 1),
+        ("shed", 1),
+        ("admit", 0),
+        ("release", 0),
+    ]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import app.middleware as middleware_module
+from app.middleware import AdmissionMiddleware
+from app.services.admission import AdmissionController
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(
+        max_concurrent=1,
+        max_queued_bytes=1000,
+        max_queued_per_user=1,
+        queue_timeout=5.0,
+        initial_service_time=0.01,
+    )
+    monkeypatch.setattr(middleware_module, "admission_controller", controller)
+    return controller
+
+def make_scope(path="/upload", method="POST", headers=None):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+
+def call(middleware, scope):
+    """
+    Run one request through the middleware. Returns the response start
+    message, or None if the inner app handled it.
+    """
+    sent = []
+
+    async def receive():
+        # The body is never expected to be read when a request is shed
+        raise AssertionError("body was read")
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return next((m for m in sent if m["type"] == "http.response.start"), None)
+
+def test_reserves_ticket_and_releases_after_response(controller):
+    seen = []
+
+    async def inner(scope, receive, send):
+        ticket = scope["state"]["admission_ticket"]
+        seen.append((ticket.granted, controller.stats()["active"]))
+
+    middleware = AdmissionMiddleware(inner)
+    call(middleware, make_scope(headers={"X-User-ID": "alice", "Content-Length": "10"}))
+
+    assert seen == [(True, 1)]
+    assert controller.stats()["active"] == 0
+
+def test_sheds_before_body_with_retry_after(controller):
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope)
+
+    async def fill():
+        # One slot held, and alice already has one upload queued
+        controller.reserve("holder", 10)
+        controller.reserve("alice", 10)
+
+    asyncio.run(fill())
+
+    middleware = AdmissionMiddleware(inner)
+    start = call(middleware, make_scope(headers={"X-User-ID": "alice", "Content-Length": "10"}))
+
+    assert start["status"] == 429
+    assert (b"retry-after", b"1") in start["headers"]
+    assert calls == []
+
+def test_requires_content_length(controller):
+    async def inner(scope, receive, send):
+        raise AssertionError("inner app should not run")
+
+    middleware = AdmissionMiddleware(inner)
+    start = call(middleware, make_scope(headers={"X-User-ID": "alice"}))
+    assert start["status"] == 411
+
+def test_other_routes_pass_through(controller):
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["path"])
+
+    middleware = AdmissionMiddleware(inner)
+    call(middleware, make_scope(path="/records", method="GET"))
+    call(middleware, make_scope(headers={"Content-Length": "10"}))
+
+    assert calls == ["/records", "/upload"]
+    assert controller.stats()["admitted_total"] == 0